@@ -1,20 +1,29 @@
 """
 Main driver for backend functionality (parsing & seating).
 """
-import math
+from http import HTTPStatus
 
-from .lib.io import parse_seating_file, parse_family_file, get_section_row_str, transform_output, format_seat_assignments, write_seat_assignments_csv
-from .lib.algo import expand_counts, get_pews
-from .utils import trim_families
+from .error_handlers import InvalidUsage
+from .lib.io import ErrorObj, parse_seating_file, parse_family_file, parse_reserved_blocks, get_section_row_str, transform_output, get_seat_ranges, format_seat_assignments, format_seat_map, write_seat_assignments_csv
+from .lib.algo import expand_counts, get_pews, place_families, placement_cost, solve_cost, allocate_reserved
+from .utils import admit_families
 from .lib.io.Family import get_family_sizes 
 
 # Main driver constants
 INCHES_PER_FT = 12
 
+# Solver budget, in subset sum table cells (about a microsecond and 100 bytes each)
+MAX_SOLVE_CELLS = 40000000 # Across every pew and both passes, keeps a request under the router timeout
+MAX_TABLE_CELLS = 2000000 # In any one pew, keeps memory use bounded
+MAX_PLACEMENT_CHECKS = 500000 # Cross-row checks, a few seconds' worth
+
 
 def main_driver( site_info, output_file ):
     """
-    Parses input, gets optimal seating arrangement, and writes to output_file
+    Parses input, gets optimal seating arrangement, and writes to output_file.
+    Returns the seat map of the arrangement (see format_seat_map), with the
+    names of the reserved blocks placed outside their section or row under
+    'movedBlocks'.
     """
     # Extract inputs
     max_cap = site_info['maxCapacity']
@@ -24,31 +33,38 @@ def main_driver( site_info, output_file ):
     pew_file, pew_filename = site_info['pewFile']
     family_file, family_filename = site_info['familyFile']
 
-    # Calculate margin and total reserved seating available
-    margin = int( math.ceil( (sep_rad * INCHES_PER_FT) / seat_width ) )
+    # Everything is measured in inches. The solver charges the margin in whole
+    # seats of each pew's own width, so pews with wider seats need fewer of them
+    margin = int( sep_rad * INCHES_PER_FT )
 
     # Parse input files
-    pew_ids, pew_sizes = parse_seating_file( pew_file, pew_filename )
+    pew_ids, pew_sizes, seat_widths, pew_positions = parse_seating_file( pew_file, pew_filename, seat_width )
     family_info_list = parse_family_file( family_file, family_filename )
+    reserved_blocks = parse_reserved_blocks( site_info.get( 'reservedBlocks' ) )
+
+    # Set aside the reserved blocks first, families get whatever is left
+    capacities, reserved, moved = place_reserved( reserved_blocks, pew_ids, pew_sizes, margin, seat_widths )
 
-    # Trim the number of families to capacity
-    max_cap = max_cap - num_reserved
-    seatable_families, unseatable_families = trim_families( family_info_list, max_cap )
+    # Only hand the solver the families that could possibly fit
+    max_cap = max_cap - max( num_reserved, sum( count for count, _, _ in reserved_blocks ) )
+    seatable_families, unseatable_families = admit_families( family_info_list, max_cap, capacities, margin, seat_widths )
 
     # Get optimal pew seating groups (per pew)
     family_sizes = get_family_sizes( seatable_families )
-    matched_pews, unmatched_pews, families_left = get_pews( family_sizes, pew_sizes, margin )
+    check_solve_cost( family_sizes, capacities, margin, seat_widths, pew_positions, family_filename )
+    matched_pews, unmatched_pews, families_left = get_pews( family_sizes, capacities, margin, seat_widths )
 
     # TODO handle unmatched pews
     print( 'Unmatched (extra) pews: ', unmatched_pews )
 
+    # Keep families apart from the rows in front and behind them too
+    seat_offsets = place_families( matched_pews, families_left, pew_sizes, margin, seat_widths, pew_positions, reserved )
+
     # Assign seating to specific families
     assigned_seating = transform_output( matched_pews, families_left, seatable_families )
-    formatted_rows = format_seat_assignments( assigned_seating, seatable_families, pew_ids, pew_sizes, margin )
-
-    # Sort by section # (column 7)
-    #sorted(formatted_rows, key = lambda x: x[6]))
-    formatted_rows.sort( key = lambda x: x[6] )
+    seat_ranges = get_seat_ranges( assigned_seating, seatable_families, pew_sizes, margin, seat_widths, seat_offsets )
+    # (sorted by section, families that didn't fit in any pew at the end)
+    formatted_rows = format_seat_assignments( seat_ranges, seatable_families, pew_ids, reserved )
 
     # Append the unseated families to the end, no seat assignments
     unseated_families = [("N", f.fname, f.lname, f.size, f.email) 
@@ -59,3 +75,57 @@ def main_driver( site_info, output_file ):
     # Write out the output
     write_seat_assignments_csv( output_file, formatted_rows )
 
+    seat_map = format_seat_map( seat_ranges, seatable_families, pew_ids, pew_sizes, seat_widths, reserved, pew_positions )
+    seat_map['unseated'] += [ { 'name': f.fname + " " + f.lname, 'size': f.size } for f in unseatable_families ]
+    seat_map['movedBlocks'] = [ "Reserved Block " + str( b + 1 ) for b in moved ]
+
+    return seat_map
+
+
+def check_solve_cost( family_sizes, pew_sizes, margin, seat_widths, pew_positions=None, filename=None ):
+    """
+    Rejects the request before solving if seating these families would take
+    more time or memory than one request is allowed, either solving for each
+    pew or keeping them apart from the rows in front and behind.
+    """
+    total, largest = solve_cost( family_sizes, pew_sizes, margin, seat_widths )
+    checks = placement_cost( family_sizes, pew_positions, margin )
+    if total <= MAX_SOLVE_CELLS and largest <= MAX_TABLE_CELLS and checks <= MAX_PLACEMENT_CHECKS:
+        return
+
+    err_obj = ErrorObj( "Seating " + str( len(family_sizes) ) + " households in " + str( len(pew_sizes) ) + " pews "\
+                        "is too large to solve in one request. Please split the reservations into smaller "\
+                        "files or lower the maximum capacity, and try submitting again.",
+                        filename or "Household Reservations File",
+                        -1,
+                        -1,
+                        "" )
+    raise InvalidUsage( err_obj.to_dict(), HTTPStatus.REQUEST_ENTITY_TOO_LARGE )
+
+
+def place_reserved( blocks, pew_ids, pew_sizes, margin, seat_widths ):
+    """
+    Allocates the reserved blocks to pews, and returns the pew capacities left
+    for families, the reserved pews and the blocks placed outside their section
+    or row (see allocate_reserved).
+    """
+    capacities, reserved, unplaced, moved = allocate_reserved( blocks, pew_ids, pew_sizes, margin, seat_widths )
+
+    def block_str( b ):
+        return str( blocks[b][0] ) + " seats" + ( " in section " + blocks[b][1] if blocks[b][1] else "" ) + \
+               ( " row " + blocks[b][2] if blocks[b][2] else "" )
+
+    if moved:
+        print( 'Reserved blocks moved to other pews: ', [ block_str( b ) for b in moved ] )
+    if not unplaced:
+        return capacities, reserved, moved
+
+    block_strs = [ block_str( b ) for b in unplaced ]
+    err_obj = ErrorObj( "There aren't enough free pews for the reserved blocks: " + ", ".join( block_strs ) + ". "\
+                        "Please fix them and try submitting again.",
+                        "Reserved Blocks",
+                        -1,
+                        -1,
+                        "" )
+    raise InvalidUsage( err_obj.to_dict() )
+
@@ -18,7 +18,7 @@ if __name__ == '__main__':
 
     # Parse inputs
     with open(file_paths[PEW_CSV_FILENAME]) as pew_file, open(file_paths[FAMILY_CSV_FILENAME]) as family_file:
-        pew_ids, pew_sizes = parse_seating_file( pew_file )
+        pew_ids, pew_sizes, seat_widths, pew_positions = parse_seating_file( pew_file )
         family_names, family_sizes, family_emails = parse_family_file( family_file )
 
         # Optimize every pew
@@ -3,9 +3,9 @@ from http import HTTPStatus
 
 class InvalidUsage(Exception):
 
-    def __init__(self, payload):
+    def __init__(self, payload, status_code=HTTPStatus.BAD_REQUEST):
         Exception.__init__(self)
-        self.status_code = HTTPStatus.BAD_REQUEST
+        self.status_code = status_code
         self.payload = payload
 
     def to_dict(self):
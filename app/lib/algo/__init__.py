@@ -1,2 +1,4 @@
 from .subset_sum import *
-from .pews import *
\ No newline at end of file
+from .pews import *
+from .distancing import *
+from .reserved import *
\ No newline at end of file
@@ -0,0 +1,239 @@
+import collections
+import math
+import numpy as np
+
+from .pews import seat_margin
+
+# How many pews a bumped family is tried in before it's unseated
+MAX_RETRY_PEWS = 16
+
+##########################################
+####      Cross-row distancing        ####
+##########################################
+class SeatGrid():
+    """
+    Spatial hash of occupied seat intervals. The venue is split into square
+    cells as wide as the separation radius, so any interval closer than that
+    to a household is in the same or a neighbouring cell.
+    """
+
+    def __init__(self, sep):
+        self.sep = sep
+        self.cells = collections.defaultdict(list)
+
+    def _cell(self, v):
+        return int(math.floor(v / self.sep))
+
+    def add(self, pew_idx, x0, x1, y):
+        """
+        Marks the interval [x0, x1] of the row at depth y as occupied.
+        """
+        interval = (pew_idx, x0, x1, y)
+        cy = self._cell(y)
+        for cx in range(self._cell(x0), self._cell(x1) + 1):
+            self.cells[(cx, cy)].append(interval)
+
+    def conflicts(self, pew_idx, x0, x1, y):
+        """
+        Returns the occupied intervals in other pews that are closer than the
+        separation radius to [x0, x1] at depth y.
+        """
+        found = set()
+        for cy in range(self._cell(y - self.sep), self._cell(y + self.sep) + 1):
+            for cx in range(self._cell(x0 - self.sep), self._cell(x1 + self.sep) + 1):
+                for interval in self.cells.get((cx, cy), ()):
+                    if interval[0] != pew_idx and interval_distance(x0, x1, y, *interval[1:]) < self.sep:
+                        found.add(interval)
+        return found
+
+
+def interval_distance(a0, a1, ay, b0, b1, by):
+    """
+    Returns the shortest distance between two horizontal intervals.
+    """
+    dx = max(0, b0 - a1, a0 - b1)
+    return math.hypot(dx, ay - by)
+
+
+def placement_cost(families, pew_positions, margin):
+    """
+    Estimates how many times place_families will check the rows in front and
+    behind for these families: once where each family sits, and once for each
+    pew a bumped family is tried in. Returns 0 when no pew has a position.
+    This is an estimate, not a bound, since a family can be pushed down its pew
+    more than once.
+    """
+    if margin <= 0 or pew_positions is None or np.isnan(pew_positions).any(axis=1).all():
+        return 0
+    return len(families) * (1 + MAX_RETRY_PEWS)
+
+
+def place_families(matched_pews, families_left, pew_sizes, margin, seat_widths, pew_positions=None, reserved=None):
+    """
+    Decides where each family sits in its pew, keeping them at least margin
+    away from the families in the rows in front and behind as well as the
+    families next to them.
+
+    Families are packed from the start of the pew. When a family is too close
+    to someone in another row, it gets pushed down the pew to the first seat
+    past them. If the pew runs out of room, the family is tried again in the
+    room left over in the other pews, in pew order, including pews that had no
+    families. Only pews with a gap wide enough for the family are tried, at
+    most MAX_RETRY_PEWS of them, and a pew that had no room for a family isn't
+    tried again for one as big. If none of them has room, the family is
+    unseated and added back to families_left. Both matched_pews and
+    families_left are updated in place.
+
+    pew_positions holds the (x, y) position of the start of each pew, in the
+    same unit as pew_sizes. Pews without a position (NaN) are not checked.
+
+    reserved holds the reserved seating blocks from allocate_reserved. They sit
+    at the start of their pews, so families in those pews start after them.
+
+    Returns a dict of pew index -> list of family offsets from the start of
+    the pew, in the same order as the pew's families. Pews that are neither
+    checked nor reserved are left out, since their families are just packed
+    from the start, which get_seat_ranges works out for every pew at once.
+    """
+    grid = SeatGrid(margin) if margin > 0 else None
+    seat_offsets = {}
+    reserved = reserved or {}
+    occupied = collections.defaultdict(list) # pew index -> [(start, end), ...]
+
+    def position(pew_idx):
+        x, y = pew_positions[pew_idx] if pew_positions is not None else (np.nan, np.nan)
+        return x, y, grid is not None and not (np.isnan(x) or np.isnan(y))
+
+    def clear_offset(pew_idx, offset, width, last_offset):
+        # Pushes the family down the pew until it's clear of the other rows,
+        # or past last_offset if there's no room
+        x, y, checked = position(pew_idx)
+        seat_width = seat_widths[pew_idx]
+        while checked and offset <= last_offset:
+            nearby = grid.conflicts(pew_idx, x + offset, x + offset + width, y)
+            if not nearby:
+                break
+
+            # Move just far enough down the pew to clear everyone nearby,
+            # to the start of the next whole seat
+            offset = max(b1 - x + math.sqrt(max(0, margin ** 2 - (y - by) ** 2))
+                         for _, b0, b1, by in nearby)
+            offset = int(math.ceil(offset / seat_width)) * seat_width
+        return offset
+
+    def pack(pew_idx, families):
+        # Lays out a pew that was left to get_seat_ranges, so more families
+        # can be added to it
+        seat_width = seat_widths[pew_idx]
+        pew_margin = seat_margin(margin, seat_width)
+        seat_offsets[pew_idx] = []
+        offset = 0
+        for size in families:
+            occupy(pew_idx, offset, size * seat_width)
+            seat_offsets[pew_idx].append(offset)
+            offset += size * seat_width + pew_margin
+
+    def occupy(pew_idx, offset, width):
+        x, y, checked = position(pew_idx)
+        if checked:
+            grid.add(pew_idx, x + offset, x + offset + width, y)
+        occupied[pew_idx].append((offset, offset + width))
+
+    # Everyone needs to keep their distance from the reserved seats, too
+    for pew_idx, (_, seats) in reserved.items():
+        occupy(pew_idx, 0, seats * seat_widths[pew_idx])
+
+    bumped = []
+    for pew_idx, families in matched_pews:
+        _, _, checked = position(pew_idx)
+        if not checked and pew_idx not in reserved:
+            continue
+
+        pew_size = pew_sizes[pew_idx]
+        seat_width = seat_widths[pew_idx]
+        pew_margin = seat_margin(margin, seat_width)
+
+        offsets = []
+        seated = []
+        next_offset = 0
+        if pew_idx in reserved:
+            next_offset = reserved[pew_idx][1] * seat_width + pew_margin
+        for i, size in enumerate(families):
+            width = size * seat_width
+
+            # Leave room for the families that still need to sit in this pew
+            rest = sum(f * seat_width + pew_margin for f in families[i + 1:])
+            last_offset = pew_size - width - rest
+
+            offset = clear_offset(pew_idx, next_offset, width, last_offset)
+            if offset > last_offset:
+                bumped.append(size)
+                continue
+
+            occupy(pew_idx, offset, width)
+            seated.append(size)
+            offsets.append(offset)
+            next_offset = offset + width + pew_margin
+
+        families[:] = seated
+        seat_offsets[pew_idx] = offsets
+
+    def gaps(pew_idx):
+        # The (start, end) of each stretch of the pew a family could sit in.
+        # The end of the pew is a gap too, and the last family there doesn't
+        # need a margin.
+        pew_margin = seat_margin(margin, seat_widths[pew_idx])
+        pew_end = pew_sizes[pew_idx] + pew_margin
+        start = 0
+        for begin, end in sorted(occupied[pew_idx]) + [(pew_end, pew_end)]:
+            yield start, begin - pew_margin
+            start = end + pew_margin
+
+    def widest_gap(pew_idx):
+        if pew_idx in pew_families and pew_idx not in seat_offsets:
+            # Packed from the start, so the only gap is at the end
+            return pew_sizes[pew_idx] - sum(f * seat_widths[pew_idx] + seat_margin(margin, seat_widths[pew_idx])
+                                            for f in pew_families[pew_idx])
+        return max(end - start for start, end in gaps(pew_idx))
+
+    # Give the families that were pushed out of their pew another go in the
+    # gaps between everyone who is seated, in any pew. Pews only fill up, so
+    # the widest gap in each pew and the smallest family each pew had no room
+    # for rule most of them out without checking the other rows.
+    pew_families = dict(matched_pews)
+    if bumped:
+        widths = np.asarray(seat_widths)
+        free = np.array([widest_gap(pew_idx) for pew_idx in range(len(pew_sizes))])
+        failed = np.full(len(pew_sizes), np.inf)
+
+    for size in bumped:
+        candidates = np.flatnonzero((free >= size * widths) & (failed > size))[:MAX_RETRY_PEWS]
+        for pew_idx in candidates.tolist():
+            if pew_idx in pew_families and pew_idx not in seat_offsets:
+                pack(pew_idx, pew_families[pew_idx])
+
+            width = size * seat_widths[pew_idx]
+            offset = None
+            for start, end in gaps(pew_idx):
+                offset = clear_offset(pew_idx, start, width, end - width)
+                if offset <= end - width:
+                    break
+                offset = None
+
+            if offset is None:
+                failed[pew_idx] = size
+                continue
+
+            if pew_idx not in pew_families:
+                pew_families[pew_idx] = []
+                seat_offsets[pew_idx] = []
+                matched_pews.append((pew_idx, pew_families[pew_idx]))
+            occupy(pew_idx, offset, width)
+            pew_families[pew_idx].append(size)
+            seat_offsets[pew_idx].append(offset)
+            free[pew_idx] = widest_gap(pew_idx)
+            break
+        else:
+            families_left[size] += 1
+
+    return seat_offsets
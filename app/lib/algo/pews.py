@@ -17,76 +17,149 @@ def expand_counts(counts):
     return np.array(expanded)
 
 
-def get_pews(families, pews, margin):
+def seat_margin(margin, seat_width=1):
+    """
+    Rounds the margin up to a whole number of seats, since a family can only
+    start at the beginning of a seat. Works on arrays of seat widths, too.
+    """
+    return -(-margin // seat_width) * seat_width
+
+
+def fit_families(family_counts, space, margin, seat_width=1):
+    """
+    Finds the family sizes that best fill the given amount of space. Each family
+    takes up its size times the seat width, plus the margin to one side rounded
+    up to whole seats.
+
+    Families only take up whole seats, so the space is rounded down to whole
+    seats. The item weights and the target are then divided by their greatest
+    common divisor before solving, so the subset sum table is no wider than it
+    has to be.
+    Returns a list of family sizes, or None if no family fits.
+    """
+    sizes = expand_counts(family_counts).astype(int)
+    if len(sizes) == 0:
+        return None
+
+    margin = seat_margin(margin, seat_width)
+    space = space - space % seat_width
+    weights = sizes * seat_width + margin
+    scale = np.gcd.reduce(np.append(weights, space))
+
+    subset = subset_sum(weights // scale, space // scale, mode='<=')
+    if not subset:
+        return None
+
+    return list((np.array(subset) * scale - margin) // seat_width) # Revert to original family sizes
+
+
+def solve_cost(families, pews, margin, seat_widths=None):
+    """
+    Estimates how much work get_pews will do for these families and pews,
+    without solving anything. Units are the same as for get_pews.
+
+    Returns a tuple of (total, largest), the number of subset sum table cells
+    over every pew and in the biggest single table. These are upper bounds, since
+    fewer families are left to seat as the pews fill up. The total includes the
+    second pass over the pews with room left, which solves at most one more
+    table per pew, each no bigger than the first. Only the subset sum tables are
+    counted, not placing families across rows (see placement_cost).
+    """
+    families = np.asarray(families, dtype=int)
+    if len(families) == 0:
+        return (0, 0)
+    if seat_widths is None:
+        seat_widths = np.ones(len(pews), dtype=int)
+
+    sizes = np.unique(families)
+    total = 0
+    largest = 0
+    for pew, seat_width in zip(pews, seat_widths):
+        pew_margin = seat_margin(margin, seat_width)
+        target = pew - pew % seat_width + pew_margin
+        weights = sizes * seat_width + pew_margin
+        scale = np.gcd.reduce(np.append(weights, target))
+        width = min(families.sum() * seat_width + pew_margin * len(families), target) // scale
+
+        cells = len(families) * (int(width) + 1)
+        total += 2 * cells
+        largest = max(largest, cells)
+
+    return (total, largest)
+
+
+def get_pews(families, pews, margin, seat_widths=None):
     """
     Returns the optimal seating group sizes for each pew, as well as any
     family sizes that aren't able to be seated (must go into overflow)
+
+    Pew sizes and the margin are measured in the same unit as seat_widths, the
+    width of a single seat in each pew. When seat_widths is not given, every
+    seat is 1 unit wide, i.e. pews and the margin are counted in seats. Families
+    start on a seat boundary, so the margin is rounded up to whole seats.
     """
     family_counts = collections.Counter(families)
+    if seat_widths is None:
+        seat_widths = np.ones(len(pews), dtype=int)
 
     matched_pews = []
     unmatched_pews = []
     for pew_idx, pew in enumerate(pews):
-        pew += margin # Extend pew artificially
-
-        expanded = expand_counts(family_counts) + margin # Add margin to each family size
-
-        if len(expanded) == 0:
+        if sum(family_counts.values()) == 0:
             break # No more families to find a subset of!
 
-        subset = subset_sum(expanded, pew, mode='<=')
+        # Extend pew artificially, since the last family doesn't need a margin
+        subset = fit_families(family_counts, pew + seat_margin(margin, seat_widths[pew_idx]), margin, seat_widths[pew_idx])
 
         if not subset:
             unmatched_pews.append(pew_idx)
             continue
 
-        subset = np.array(subset) - margin # Revert to original family sizes
-
         for fam in subset:
             family_counts[fam] -= 1
 
-        matched_pews.append((pew_idx, list(subset)))
+        matched_pews.append((pew_idx, subset))
 
     # Isolate all imperfect pews: pews that hypothetically could fit more people while still distancing
-    imperfect_pews = list(filter(lambda p: pew_leftover(pews[p[0]], p[1], margin) != 0, matched_pews))
+    imperfect_pews = list(filter(lambda p: pew_leftover(pews[p[0]], p[1], margin, seat_widths[p[0]]) != 0, matched_pews))
 
-    # Try swapping between imperfect pews to find if there are people who might fit
+    # Try swapping between imperfect pews to find if there are people who might fit.
+    # Families can only be swapped between pews with the same seat width.
     if len(imperfect_pews) > 1 and sum(family_counts.values()) > 0:
         print('imperfect before swap:', imperfect_pews)
-        swap_families(pews, imperfect_pews, margin)
+        for seat_width in set(seat_widths[p[0]] for p in imperfect_pews):
+            same_width_pews = [p for p in imperfect_pews if seat_widths[p[0]] == seat_width]
+            swap_families(pews, same_width_pews, margin, seat_width)
         print('imperfect after swap:', imperfect_pews)
 
         # This essentially becomes another subset problem, but now we're looking for the subset
         # of the remaining families that can sum to the leftover space we might have
         # aggregated by swapping.
         for pew_idx, matched_families in imperfect_pews:
-            leftover = pew_leftover(pews[pew_idx], matched_families, margin)
-
-            expanded = expand_counts(family_counts) + margin
-
-            if len(expanded) == 0:
+            if sum(family_counts.values()) == 0:
                 break
 
-            subset = subset_sum(expanded, leftover, mode='<=')
+            leftover = pew_leftover(pews[pew_idx], matched_families, margin, seat_widths[pew_idx])
+            subset = fit_families(family_counts, leftover, margin, seat_widths[pew_idx])
 
             if subset:
-                subset = np.array(subset) - margin
                 for fam in subset:
                     family_counts[fam] -= 1
                     matched_families.append(fam)
                 
     return (matched_pews, unmatched_pews, family_counts)
 
-def pew_leftover(pew_size, family_sizes, margin):
+def pew_leftover(pew_size, family_sizes, margin, seat_width=1):
     """
     Returns the amount of leftover space within a pew that is not being
     used by the families currently sitting in it.
     A family "uses" the spaces to seat family members, plus the margin
-    to one side needed to maintain distance.
+    to one side needed to maintain distance, rounded up to whole seats.
     """
-    return pew_size + margin - sum(f + margin for f in family_sizes)
+    margin = seat_margin(margin, seat_width)
+    return pew_size + margin - sum(f * seat_width + margin for f in family_sizes)
 
-def swap_families(pew_sizes, matched_pews, margin):
+def swap_families(pew_sizes, matched_pews, margin, seat_width=1):
     """
     Performs best swap possible between all pews in matched_pews, until no more
     best swaps can be performed. Swaps are done in-place.
@@ -101,7 +174,7 @@ def swap_families(pew_sizes, matched_pews, margin):
                 (pew_idx_b, families_b) = matched_pews[b]
                 pew_size_b = pew_sizes[pew_idx_b]
 
-                (fa, fb) = best_swap(pew_size_a, families_a, pew_size_b, families_b, margin)
+                (fa, fb) = best_swap(pew_size_a, families_a, pew_size_b, families_b, margin, seat_width)
 
                 if fa is None or fb is None:
                     continue
@@ -113,7 +186,7 @@ def swap_families(pew_sizes, matched_pews, margin):
                 
                 swap = True
 
-def best_swap(pew_size_a, families_a, pew_size_b, families_b, margin):
+def best_swap(pew_size_a, families_a, pew_size_b, families_b, margin, seat_width=1):
     """
     Finds the best swap between pews a and b which will increase the
     gradient between their leftover values.
@@ -122,8 +195,8 @@ def best_swap(pew_size_a, families_a, pew_size_b, families_b, margin):
     pews a and b, respectively.
     If no such swap exists, returns (None, None).
     """
-    leftover_a = pew_leftover(pew_size_a, families_a, margin)
-    leftover_b = pew_leftover(pew_size_b, families_b, margin)
+    leftover_a = pew_leftover(pew_size_a, families_a, margin, seat_width)
+    leftover_b = pew_leftover(pew_size_b, families_b, margin, seat_width)
     curr_diff = abs(leftover_a - leftover_b)
 
     max_diff = curr_diff # Limit swaps to ones that will land us in a better situation than the current one
@@ -135,7 +208,7 @@ def best_swap(pew_size_a, families_a, pew_size_b, families_b, margin):
 
     for fa in families_a:
         for fb in families_b:
-            swap = fa - fb # How much the leftover will change for pew a if we swap fa and fb
+            swap = (fa - fb) * seat_width # How much the leftover will change for pew a if we swap fa and fb
 
             # Skip invalid swaps, where the leftover would be negative (impossible) on either pew.
             if leftover_a + swap < 0 or leftover_b - swap < 0:
@@ -0,0 +1,86 @@
+import numpy as np
+
+from .pews import seat_margin
+
+##########################################
+####      Reserved seating blocks     ####
+##########################################
+def allocate_reserved(blocks, pew_ids, pew_sizes, margin, seat_widths=None):
+    """
+    Sets aside pews for reserved seating blocks before any families are seated.
+    Each block is a tuple of (count, section, row), where section and row may be
+    None to allow any section or row. Blocks are seated at the start of a pew,
+    and at most one block goes in each pew.
+
+    A block goes in the smallest matching pew it fits in. If no single pew is big
+    enough, it's split over the biggest matching pews. The most specific blocks
+    are placed first, so blocks that can go anywhere don't take their pews. The
+    section and row are only preferences: a block that doesn't fit in them is
+    placed in any free pews instead, and listed in moved.
+
+    Returns a tuple of (capacities, reserved, unplaced, moved):
+      - capacities: the pew sizes left for families, after each block and the
+        margin to its side in whole seats. Pass these to get_pews.
+      - reserved: a dict of pew index -> (block index, number of seats).
+      - unplaced: the indices of the blocks that didn't fit.
+      - moved: the indices of the blocks placed outside their section or row.
+    """
+    pew_sizes = np.asarray(pew_sizes)
+    if seat_widths is None:
+        seat_widths = np.ones(len(pew_sizes), dtype=int)
+    seat_widths = np.asarray(seat_widths)
+    sections, rows = np.asarray(pew_ids[0]), np.asarray(pew_ids[1])
+
+    free = np.ones(len(pew_sizes), dtype=bool)
+    seats = pew_sizes // seat_widths
+    reserved = {}
+    unplaced = []
+    moved = []
+
+    def place(b, candidates):
+        count = blocks[b][0]
+
+        fits = candidates[seats[candidates] >= count]
+        if len(fits) > 0:
+            pew_idx = fits[np.argmin(seats[fits])] # First of the smallest, in pew order
+            reserved[int(pew_idx)] = (b, count)
+            free[pew_idx] = False
+            return True
+
+        # Split over the biggest pews, if they can hold everyone
+        biggest = candidates[np.argsort(-seats[candidates], kind='stable')]
+        taken = np.cumsum(seats[biggest])
+        if len(biggest) == 0 or taken[-1] < count:
+            return False
+
+        used = biggest[:np.searchsorted(taken, count) + 1]
+        left = count
+        for pew_idx in used:
+            n = int(min(seats[pew_idx], left))
+            reserved[int(pew_idx)] = (b, n)
+            free[pew_idx] = False
+            left -= n
+        return True
+
+    order = sorted(range(len(blocks)), key=lambda b: (blocks[b][2] is None, blocks[b][1] is None, -blocks[b][0]))
+    for b in order:
+        _, section, row = blocks[b]
+
+        matching = free.copy()
+        if section is not None:
+            matching &= sections == section
+        if row is not None:
+            matching &= rows == row
+        if place(b, np.flatnonzero(matching)):
+            continue
+
+        if (section is not None or row is not None) and place(b, np.flatnonzero(free)):
+            moved.append(b)
+        else:
+            unplaced.append(b)
+
+    capacities = pew_sizes.copy()
+    for pew_idx, (_, n) in reserved.items():
+        capacities[pew_idx] = max(0, pew_sizes[pew_idx] - n * seat_widths[pew_idx] - seat_margin(margin, seat_widths[pew_idx]))
+
+    return capacities, reserved, sorted(unplaced), sorted(moved)
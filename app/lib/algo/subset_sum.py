@@ -8,7 +8,12 @@ def subset_sum(numbers, target, mode='=='):
     Finds a subset of the numbers which sum to the target.
     """
     N = len(numbers)
-    F = sum(numbers)
+
+    # Sums past the target can never be part of the answer, so the table only
+    # needs to be as wide as the target (or the total, if that's smaller).
+    if target < 0:
+        return None
+    F = min(sum(numbers), target)
 
     Q = np.full((N, F + 1), False) # Query Array
     B = np.full((N, F + 1), None) # Backpointer Array
@@ -54,9 +59,6 @@ def subset_sum(numbers, target, mode='=='):
         i, s = N - 1, target
     elif mode == '<=':
         # Check for sums that are less than or equal to the target in the bottom row.
-        if target < 0:
-            return None
-
         valid_sums = np.where(B[N - 1, :target + 1] != None)[0]
         if len(valid_sums) == 0:
             return None
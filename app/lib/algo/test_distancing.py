@@ -0,0 +1,112 @@
+import collections
+import numpy as np
+
+from .distancing import MAX_RETRY_PEWS, SeatGrid, place_families, placement_cost
+
+def test_seat_grid():
+    grid = SeatGrid(72)
+    grid.add(0, 0, 54, 36)
+
+    # Directly behind
+    assert len(grid.conflicts(1, 0, 36, 72)) == 1
+
+    # Far enough down the row behind
+    assert grid.conflicts(1, 54 + 63, 150, 72) == set()
+
+    # Same pew is handled by the margin, not the grid
+    assert grid.conflicts(0, 60, 90, 36) == set()
+
+def test_placement_cost():
+    positions = np.array([[0, 36], [np.nan, np.nan]])
+
+    assert placement_cost([3, 2, 1], positions, 72) == 3 * (1 + MAX_RETRY_PEWS)
+
+    # Nothing to check without positions or a margin
+    assert placement_cost([3, 2, 1], np.full((2, 2), np.nan), 72) == 0
+    assert placement_cost([3, 2, 1], None, 72) == 0
+    assert placement_cost([3, 2, 1], positions, 0) == 0
+
+def test_place_families():
+    pews = [180, 180] # 10 seats of 18"
+    seat_widths = [18, 18]
+    positions = np.array([[0, 36], [0, 72]])
+    matched = [
+        (0, [3]),
+        (1, [2, 1])
+    ]
+    families_left = collections.Counter()
+
+    offsets = place_families(matched, families_left, pews, 72, seat_widths, positions)
+
+    # Pushing the family of 2 until it's 6' from the family of 3 would leave no
+    # room for the family of 1, so only the family of 1 is seated in that row.
+    # It's pushed to seat 8, the first whole seat 6' from the family of 3.
+    assert offsets == {0: [0], 1: [126]}
+    assert matched == [(0, [3]), (1, [1])]
+    assert families_left == collections.Counter({2: 1})
+
+def test_place_families_retry():
+    pews = [180, 180, 180] # 10 seats of 18"
+    seat_widths = [18, 18, 18]
+    positions = np.array([[0, 36], [0, 72], [0, 360]]) # Row 3 is far back
+    matched = [
+        (0, [4]),
+        (1, [4])
+    ]
+    families_left = collections.Counter()
+
+    offsets = place_families(matched, families_left, pews, 72, seat_widths, positions)
+
+    # There's no room in row 2 behind the first family, but row 3 is empty
+    assert offsets == {0: [0], 1: [], 2: [0]}
+    assert matched == [(0, [4]), (1, []), (2, [4])]
+    assert sum(families_left.values()) == 0
+
+def test_place_families_no_geometry():
+    matched = [(0, [3, 2]), (1, [2])]
+    families_left = collections.Counter()
+
+    offsets = place_families(matched, families_left, [10, 10], 4, [1, 1])
+
+    # Nothing to check, so the families stay packed from the start of the pew
+    # and get_seat_ranges works out where they sit
+    assert offsets == {}
+    assert matched == [(0, [3, 2]), (1, [2])]
+    assert sum(families_left.values()) == 0
+
+def test_place_families_retry_packed():
+    pews = [180, 180, 180] # 10 seats of 18"
+    seat_widths = [18, 18, 18]
+    positions = np.array([[0, 36], [0, 72], [np.nan, np.nan]])
+    matched = [
+        (0, [4]),
+        (1, [4]),
+        (2, [2])
+    ]
+    families_left = collections.Counter()
+
+    offsets = place_families(matched, families_left, pews, 72, seat_widths, positions)
+
+    # The last pew isn't checked, but it has room after its family of 2
+    assert offsets == {0: [0], 1: [], 2: [0, 108]}
+    assert matched == [(0, [4]), (1, []), (2, [2, 4])]
+    assert sum(families_left.values()) == 0
+
+def test_place_families_retry_scaling(monkeypatch):
+    # Rows 2' apart, so most families get bumped from every other row
+    n = 200
+    pews = [30 * 18] * n
+    seat_widths = [18] * n
+    positions = np.array([[0, 24 * (i + 1)] for i in range(n)])
+    matched = [(i, [2, 1, 2, 1, 2]) for i in range(n)]
+    families_left = collections.Counter()
+
+    calls = []
+    conflicts = SeatGrid.conflicts
+    monkeypatch.setattr(SeatGrid, 'conflicts', lambda self, *args: calls.append(args) or conflicts(self, *args))
+
+    place_families(matched, families_left, pews, 72, seat_widths, positions)
+
+    # Retrying bumped families mustn't check every pew for every family
+    assert sum(families_left.values()) > n
+    assert len(calls) < 40 * n
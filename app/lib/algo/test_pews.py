@@ -1,4 +1,6 @@
-from .pews import get_pews, swap_families, best_swap, pew_leftover
+import collections
+
+from .pews import get_pews, swap_families, best_swap, pew_leftover, fit_families, solve_cost
 
 def unordered(matches):
     return list(map(to_unordered_match, matches))
@@ -49,4 +51,55 @@ def test_main():
     # assert unmatched == []
     # assert sum(families_left.values()) == 0
 
-    
\ No newline at end of file
+
+def test_fit_families_inches():
+    # 18" seats with 6' (72") of separation scales down to the seat model
+    counts = collections.Counter([3, 2, 1])
+    assert sorted(fit_families(counts, 8 * 18 + 72, 72, 18)) == [1, 3]
+    assert sorted(fit_families(counts, 8 + 4, 4)) == [1, 3]
+
+    # Families start on a seat, so 5' of separation still takes 4 whole 18"
+    # seats, the same as the seat model. 20" seats only need 3.
+    counts = collections.Counter([1, 1, 1])
+    assert fit_families(counts, 10 * 18 + 72, 60, 18) == [1, 1]
+    assert fit_families(counts, 10 + 4, 4) == [1, 1]
+    assert fit_families(counts, 10 * 20 + 60, 60, 20) == [1, 1, 1]
+
+    # A partial seat can't be used, and doesn't make the table any wider
+    counts = collections.Counter([3, 2, 1])
+    assert sorted(fit_families(counts, 8 * 18 + 5 + 72, 72, 18)) == [1, 3]
+
+    assert fit_families(counts, 20, 72, 18) is None
+    assert fit_families(collections.Counter(), 100, 72, 18) is None
+
+def test_get_pews_seat_widths():
+    families = [1, 3, 1, 3, 1]
+    pews = [10 * 18, 10 * 20] # inches
+    seat_widths = [18, 20]
+    margin = 60
+
+    (matched, unmatched, families_left) = get_pews(families, pews, margin, seat_widths)
+
+    assert unordered(matched) == unordered([
+        (0, [3, 3]),
+        (1, [1, 1, 1])
+    ])
+    assert unmatched == []
+    assert sum(families_left.values()) == 0
+
+def test_solve_cost():
+    families = [1, 2, 3]
+
+    # Seat model: the first table is as wide as the pew plus the margin, and the
+    # second one only as wide as every family plus their margins. Each pew may
+    # be solved twice.
+    assert solve_cost(families, [6, 20], 4) == (2 * (3 * 11 + 3 * 19), 3 * 19)
+
+    # The same pews in inches scale back down by the GCD of 18
+    assert solve_cost(families, [6 * 18, 20 * 18], 72, [18, 18]) == (2 * (3 * 11 + 3 * 19), 3 * 19)
+
+    # Partial pews cost the same as the whole seats in them
+    assert solve_cost(families, [6 * 18 + 5, 20 * 18 + 17], 72, [18, 18]) == (2 * (3 * 11 + 3 * 19), 3 * 19)
+
+    assert solve_cost([], [6, 20], 4) == (0, 0)
+
@@ -0,0 +1,41 @@
+import numpy as np
+
+from .reserved import allocate_reserved
+
+def test_allocate_reserved():
+    pew_ids = (np.array(['A', 'A', 'B', 'B']), np.array(['1', '2', '1', '2']))
+    pews = [10, 6, 8, 8]
+    margin = 4
+    blocks = [
+        (5, None, None), # Anywhere, goes in the smallest pew it fits
+        (3, 'A', '1'),
+        (12, 'B', None), # Too big for any one pew in B
+    ]
+
+    capacities, reserved, unplaced, moved = allocate_reserved(blocks, pew_ids, pews, margin)
+
+    assert reserved == {0: (1, 3), 1: (0, 5), 2: (2, 8), 3: (2, 4)}
+    assert list(capacities) == [3, 0, 0, 0]
+    assert unplaced == []
+    assert moved == []
+
+def test_allocate_reserved_unplaced():
+    pew_ids = (np.array(['A', 'B']), np.array(['1', '1']))
+    pews = [10 * 18, 8 * 18]
+    seat_widths = [18, 18]
+
+    capacities, reserved, unplaced, moved = allocate_reserved([(9, 'B', None), (4, 'B', None)], pew_ids, pews, 72, seat_widths)
+
+    # Section B is too small for the first block, so it goes in A instead, and
+    # the smaller block still gets B
+    assert reserved == {0: (0, 9), 1: (1, 4)}
+    assert list(capacities) == [0, 0]
+    assert unplaced == []
+    assert moved == [0]
+
+    # Nothing is big enough for 30 seats anywhere
+    capacities, reserved, unplaced, moved = allocate_reserved([(30, 'B', None)], pew_ids, pews, 72, seat_widths)
+
+    assert reserved == {}
+    assert unplaced == [0]
+    assert moved == []
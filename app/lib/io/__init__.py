@@ -1,9 +1,11 @@
 import numpy as np
+import collections
 import csv
 import re
 from enum import IntEnum
 
 from ...error_handlers import InvalidUsage
+from ..algo.pews import seat_margin
 from .Family import FamilyFile, FamilyInfo, get_family_names, get_family_sizes, get_family_emails
 
 # Pew seating file constants
@@ -11,6 +13,10 @@ class PewFile(IntEnum):
     SECTION_COL_IDX = 0
     ROW_NUM_IDX = 1
     CAPACITY_IDX = 2
+    SEAT_WIDTH_IDX = 3 # Optional
+    X_OFFSET_IDX = 4 # Optional, with ROW_SPACING_IDX
+    ROW_SPACING_IDX = 5 # Optional, with X_OFFSET_IDX
+    Y_POS_IDX = 6 # Not in the file, computed from ROW_SPACING_IDX
 
 
 ##########################################
@@ -96,16 +102,26 @@ def parse_family_file( family_file, filename=None ):
     return families
 
 
-def parse_seating_file( seating_file, filename=None ):
+def parse_seating_file( seating_file, filename=None, seat_width=1 ):
     """
     Reads the CSV file containing pew information. The file must be a CSV file,
-    and have the following three columns: Section, Row #, Capacity.
+    and have the following three columns: Section, Row #, Capacity. An optional
+    fourth column gives the width of a seat in that pew (in inches), otherwise
+    seat_width is used. The capacity may be fractional, for partial pews.
 
-    Returns a tuple of parallel np.arrays of the pew's id and the pew's capacity, respectively.
+    Two more optional columns give the pew's geometry (in inches): X Offset, where
+    the pew starts across the venue, and Row Spacing, how far behind the previous
+    row of the same section (in file order) the pew is.
 
-        (pew_ids, capacities) = parse_seating_file(...)
+    Returns a tuple of parallel np.arrays of the pew's id, the pew's length, the
+    pew's seat width and the pew's (x, y) position, respectively. The pew length
+    is measured in the same unit as the seat width (capacity * seat width, rounded
+    down). Pews without geometry have a NaN position.
+
+        (pew_ids, lengths, seat_widths, positions) = parse_seating_file(...)
     """
     pews = []
+    section_depths = {}
 
     # Discard the first row of column labels
     seating_file.readline()
@@ -119,8 +135,8 @@ def parse_seating_file( seating_file, filename=None ):
         try:
             row = line.split( "," )
 
-            if len(row) != len(PewFile):
-                err_obj = ErrorObj( "PewFile - Expected 3 columns, but found " + str( len(row) ) + " columns in this row. "\
+            if len(row) not in (3, 4, 6):
+                err_obj = ErrorObj( "PewFile - Expected 3, 4 or 6 columns, but found " + str( len(row) ) + " columns in this row. "\
                                     "Please fix it and try submitting again.",
                                     filename or "Pew Seating Info File",
                                     row_num,
@@ -128,10 +144,12 @@ def parse_seating_file( seating_file, filename=None ):
                                     line )
                 raise InvalidUsage( err_obj.to_dict() )
 
-            pews.append( [row[PewFile.SECTION_COL_IDX], row[PewFile.ROW_NUM_IDX], int( row[PewFile.CAPACITY_IDX] )] )
+            capacity = float( row[PewFile.CAPACITY_IDX] )
+            if not np.isfinite( capacity ) or capacity < 0:
+                raise ValueError
 
         except ValueError:
-            err_obj = ErrorObj( "This cell is empty or contains a non-numerical pew capacity (size) value. "\
+            err_obj = ErrorObj( "This cell is empty or contains a non-numerical or negative pew capacity (size) value. "\
                                 "Please fix it and try submitting again.",
                                 filename or "Pew Seating Info File",
                                 row_num,
@@ -139,10 +157,56 @@ def parse_seating_file( seating_file, filename=None ):
                                 line )
             raise InvalidUsage( err_obj.to_dict() )
 
+        try:
+            pew_seat_width = seat_width
+            if len(row) > PewFile.SEAT_WIDTH_IDX and row[PewFile.SEAT_WIDTH_IDX].strip():
+                pew_seat_width = int( row[PewFile.SEAT_WIDTH_IDX] )
+                if pew_seat_width <= 0:
+                    raise ValueError
+            pew_length = int( capacity * pew_seat_width )
+
+        except ValueError:
+            err_obj = ErrorObj( "This cell contains a seat width that is not a positive whole number of inches. "\
+                                "Please fix it and try submitting again.",
+                                filename or "Pew Seating Info File",
+                                row_num,
+                                PewFile.SEAT_WIDTH_IDX + 1,
+                                line )
+            raise InvalidUsage( err_obj.to_dict() )
+
+        col = PewFile.X_OFFSET_IDX
+        try:
+            x_offset, row_spacing, y_pos = np.nan, np.nan, np.nan
+            if len(row) > PewFile.ROW_SPACING_IDX and row[PewFile.X_OFFSET_IDX].strip():
+                x_offset = float( row[PewFile.X_OFFSET_IDX] )
+                if not np.isfinite( x_offset ):
+                    raise ValueError
+                col = PewFile.ROW_SPACING_IDX
+                row_spacing = float( row[PewFile.ROW_SPACING_IDX] )
+                if not np.isfinite( row_spacing ):
+                    raise ValueError
+
+                # Rows are listed front to back, so each row sits behind the last one
+                section = row[PewFile.SECTION_COL_IDX]
+                y_pos = section_depths.get( section, 0 ) + row_spacing
+                section_depths[section] = y_pos
+
+        except ValueError:
+            err_obj = ErrorObj( "This cell is empty or contains a non-numerical pew position value. "\
+                                "Please fix it and try submitting again.",
+                                filename or "Pew Seating Info File",
+                                row_num,
+                                col + 1,
+                                line )
+            raise InvalidUsage( err_obj.to_dict() )
+
+        pews.append( [row[PewFile.SECTION_COL_IDX], row[PewFile.ROW_NUM_IDX], pew_length, pew_seat_width,
+                      x_offset, row_spacing, y_pos] )
+
     pews = np.array( pews )
     pews_sorted = pews[np.argsort( pews[:,PewFile.ROW_NUM_IDX] )]
 
-    return __get_pew_ids(pews_sorted), __get_pew_sizes(pews_sorted)
+    return __get_pew_ids(pews_sorted), __get_pew_sizes(pews_sorted), __get_pew_seat_widths(pews_sorted), __get_pew_positions(pews_sorted)
 
 
 def __get_pew_ids( pew_info ):
@@ -158,6 +222,55 @@ def __get_pew_sizes( pew_info ):
     """
     return pew_info[:, PewFile.CAPACITY_IDX].astype(int)
 
+
+def __get_pew_seat_widths( pew_info ):
+    """
+    Returns a list of the pew seat widths from the pew info matrix.
+    """
+    return pew_info[:, PewFile.SEAT_WIDTH_IDX].astype(int)
+
+
+def __get_pew_positions( pew_info ):
+    """
+    Returns the (x, y) position of each pew from the pew info matrix.
+    """
+    return pew_info[:, [PewFile.X_OFFSET_IDX, PewFile.Y_POS_IDX]].astype(float)
+
+def parse_reserved_blocks( spec, filename=None ):
+    """
+    Reads the reserved seating blocks, written as a comma separated list of
+    blocks like "12@A:1, 6@B, 4". Each block is a number of seats, optionally
+    followed by @ and the section it should be in, and optionally : and the row.
+
+    Returns a list of (count, section, row) tuples, with None for a section or
+    row that wasn't given.
+    """
+    blocks = []
+    for block in ( spec or "" ).split( "," ):
+        block = block.strip()
+        if not block:
+            continue
+
+        count, _, where = block.partition( "@" )
+        section, _, row = where.partition( ":" )
+        try:
+            count = int( count )
+            if count <= 0:
+                raise ValueError
+        except ValueError:
+            err_obj = ErrorObj( "Reserved block \"" + block + "\" should be a number of seats, optionally followed by "\
+                                "@section or @section:row (e.g. 12@A:1). Please fix it and try submitting again.",
+                                filename or "Reserved Blocks",
+                                -1,
+                                -1,
+                                spec )
+            raise InvalidUsage( err_obj.to_dict() )
+
+        blocks.append( (count, section.strip() or None, row.strip() or None) )
+
+    return blocks
+
+
 ##########################################
 ####         Output re-format         ####
 ##########################################
@@ -179,32 +292,29 @@ def transform_output( optimal_pew_groups, families_left, seatable_family_info ):
         seatable_family_info - list of families
 
     Returns:
-        List of tuples with pews and families that can sit there
+        List of tuples with pews and families that can sit there, as
+        (pew_id, [(family_name, family_size, family_idx), ...])
     """
     family_names = get_family_names( seatable_family_info )
     family_sizes = get_family_sizes( seatable_family_info )
 
     # Convert family and family sizes to an internal mapping.
-    # Family names with size s will exist in a list at map[s - 1].
-    family_name_size_map = [[] for _ in range( max( family_sizes ) )]
+    # Families with size s will exist in a queue at map[s - 1], in file order.
+    family_name_size_map = [collections.deque() for _ in range( max( family_sizes, default=0 ) )]
     for i, size in enumerate( family_sizes ):
-        family_name_size_map[size - 1].append( family_names[i] )
+        family_name_size_map[size - 1].append( i )
 
-    # Convert input into pew_id, list of family names tuple
-    result = []
-    for pew in optimal_pew_groups:
-        # Convert the pew's group sizes to family names
-        pew_family_names = []
-        for size in pew[1]:
-            pew_family_names.append( (family_name_size_map[size - 1].pop(0), size) )
-        pew_assign = (pew[0], pew_family_names)
+    def next_family( size ):
+        idx = family_name_size_map[size - 1].popleft()
+        return (family_names[idx], size, idx)
 
-        result.append( pew_assign )
+    # Convert input into pew_id, list of family names tuple
+    result = [ (pew[0], [ next_family( size ) for size in pew[1] ]) for pew in optimal_pew_groups ]
 
     # Append families that could not fit in pews
     for size in families_left:
-        if families_left[size] > 0:
-            result.append( (-1, [(family_name_size_map[size - 1].pop(0), size)] ) )
+        for _ in range( families_left[size] ):
+            result.append( (-1, [next_family( size )]) )
 
     return result
 
@@ -222,62 +332,153 @@ def get_section_row_str( arr_idx, pew_ids ):
     return sections[arr_idx], sections[arr_idx], rows[arr_idx]
 
 
-def format_seat_assignments( assigned_seating, family_info, pew_ids, pew_sizes, margin ):
+def get_seat_ranges( assigned_seating, family_info, pew_sizes, margin, seat_widths=None, seat_offsets=None ):
     """
-    Input looks like:
-    [(row_idx, [('family1_name', family1_size), ...]), ...]
+    Works out which seats each seated family gets.
+
+    Pew sizes and the margin are measured in the same unit as seat_widths. When
+    seat_widths is not given, they are counted in seats.
+
+    seat_offsets optionally maps a row_idx to where each of its families starts
+    in the pew (see place_families). Families in the other pews are packed from
+    the start.
+
+    Returns a tuple of parallel np.arrays for the seated families, in seating
+    order: the pew index, the family index, the offset into the pew, and the
+    first and one-past-last seat numbers. The last item is an np.array of the
+    family indices that could not be seated.
+
+        (pews, idxs, offsets, first_seats, end_seats, unseated_idxs) = get_seat_ranges(...)
+    """
+    if seat_widths is None:
+        seat_widths = np.ones( len(pew_sizes), dtype=int )
+
+    # Flatten the seating into parallel arrays, one entry per family
+    pews = np.array( [ row_idx for row_idx, seating in assigned_seating for _ in seating ], dtype=int )
+    idxs = np.array( [ family[2] for _, seating in assigned_seating for family in seating ], dtype=int )
+
+    seated = pews != -1
+    unseated_idxs = idxs[~seated]
+    pews, idxs = pews[seated], idxs[seated]
+    sizes = get_family_sizes( family_info )[idxs]
+    widths = np.asarray( seat_widths )[pews]
+
+    pew_starts = pews != np.r_[-1, pews[:-1]]
+    pew_order = pews[pew_starts]
+    seat_offsets = seat_offsets or {}
+    given = np.array( [ p in seat_offsets for p in pew_order ], dtype=bool )[np.cumsum( pew_starts ) - 1]
+
+    offsets = np.zeros( len(pews), dtype=int )
+    if given.any():
+        offsets[given] = np.concatenate( [ seat_offsets[p] for p in pew_order if p in seat_offsets ] )
+
+    # Everywhere else, families are packed from the start of the pew, each one
+    # followed by the margin in whole seats, so a family starts where the
+    # families before it in the pew end.
+    packed = ~given
+    footprints = sizes[packed] * widths[packed] + seat_margin( margin, widths[packed] )
+    packed_starts = pew_starts[packed]
+    packed_offsets = np.cumsum( footprints ) - footprints
+    offsets[packed] = packed_offsets - packed_offsets[packed_starts][np.cumsum( packed_starts ) - 1]
+
+    # Seats are numbered by where the family starts. Families past the end of
+    # the pew don't get any seats.
+    first_seats = offsets // widths + 1
+    end_seats = np.where( offsets < np.asarray( pew_sizes )[pews], first_seats + sizes, first_seats )
+
+    return pews, idxs, offsets, first_seats, end_seats, unseated_idxs
+
+
+def format_seat_assignments( seat_ranges, family_info, pew_ids, reserved=None ):
+    """
+    seat_ranges is what get_seat_ranges returns for the seating. reserved holds
+    the reserved seating blocks from allocate_reserved, if any.
+
+    Returns the output rows sorted by section, with the reserved blocks first
+    and families that could not be seated at the end.
     """
-    family_names = get_family_names( family_info )
-    family_emails = get_family_emails( family_info )
-    family_sizes = get_family_sizes( family_info )
+    pews, idxs, _, first_seats, end_seats, unseated_idxs = seat_ranges
 
+    sizes = get_family_sizes( family_info )
+    fnames = np.array( [ f.fname for f in family_info ], dtype=object )
+    lnames = np.array( [ f.lname for f in family_info ], dtype=object )
+    emails = np.array( get_family_emails( family_info ), dtype=object )
+
+    sections = np.asarray( pew_ids[0] )[pews]
+    row_nos = np.asarray( pew_ids[1] )[pews]
+
+    # Reserved blocks sit at the start of their pews
     rows = []
-    for pew in assigned_seating:
-        next_open_seat = 0
-
-        row_idx = pew[0]
-        seating = pew[1]
-
-        for family in seating:
-            name = family[0].split(",")
-            fname, lname = name[0], name[1]
-            size = family[1]
-
-            # Get the family's info to print
-            # TODO hacky fix for now, will find a better/faster solution
-            idx = family_names.index( family[0] )
-            if family_sizes[idx] != size:
-                for i in range(idx, len(family_names)):
-                    if family_sizes[i] == size and family_names[i] == family[0]:
-                       idx = i
-                       break
-
-            # If it's an unseated family, there's only one of them in the row
-            if row_idx == -1:
-                rows.append( ("N", fname, lname, size, family_emails[idx] ) )
-                continue
-
-            row = ("N", fname, lname, family_sizes[idx], family_emails[idx])
-            row += get_section_row_str( row_idx, pew_ids )
-
-            curr_pew_size = pew_sizes[row_idx]
-            seat_nos = []
-            if next_open_seat < curr_pew_size:
-                # Populate seat #s
-                for i in range(size):
-                    seat_nos.append( next_open_seat + 1 )
-                    next_open_seat += 1
-
-            row += (seat_nos,)
-            rows.append( row )
-
-            # If not the end of the pew, add padding
-            if next_open_seat != curr_pew_size - 1:
-                next_open_seat += margin
+    for pew_idx in sorted( reserved or {}, key=lambda p: pew_ids[0][p] ):
+        block, seats = reserved[pew_idx]
+        rows.append( ("N", "Reserved", "Block " + str( block + 1 ), seats, "", pew_ids[0][pew_idx], pew_ids[0][pew_idx],
+                      pew_ids[1][pew_idx], list( range( 1, seats + 1 ) )) )
+
+    # Sort by section, keeping the pew order within a section
+    order = np.argsort( sections, kind='stable' )
+    seat_nos = [ list( range( a, b ) ) for a, b in zip( first_seats[order].tolist(), end_seats[order].tolist() ) ]
+    sorted_idxs = idxs[order]
+    rows += list( zip( ["N"] * len(order), fnames[sorted_idxs], lnames[sorted_idxs], sizes[sorted_idxs],
+                      emails[sorted_idxs], sections[order], sections[order], row_nos[order], seat_nos ) )
+
+    # Families that could not fit in pews have no seat assignment
+    rows += list( zip( ["N"] * len(unseated_idxs), fnames[unseated_idxs], lnames[unseated_idxs], sizes[unseated_idxs],
+                       emails[unseated_idxs] ) )
 
     return rows
 
 
+def format_seat_map( seat_ranges, family_info, pew_ids, pew_sizes, seat_widths=None, reserved=None, pew_positions=None ):
+    """
+    Builds a JSON-ready seat map of the plan, for drawing the church. Takes the
+    same parameters as format_seat_assignments, plus the pew sizes, seat widths
+    and pew positions from parse_seating_file. Reserved blocks are listed as
+    households with 'reserved': True.
+
+    Looks like:
+    { 'sections': ['A', ...],
+      'pews': [ { 'section': 'A', 'row': '1', 'length': 180, 'seatWidth': 18, 'x': 0, 'y': 36,
+                  'households': [ { 'name': 'David Tu', 'size': 4, 'offset': 0, 'seats': [1, 4] }, ... ] },
+                ... ],
+      'unseated': [ { 'name': 'David Tu', 'size': 4 }, ... ] }
+
+    Seat ranges are inclusive. Positions are null for pews without geometry.
+    """
+    if seat_widths is None:
+        seat_widths = np.ones( len(pew_sizes), dtype=int )
+    if pew_positions is None:
+        pew_positions = np.full( (len(pew_sizes), 2), np.nan )
+
+    pews, idxs, offsets, first_seats, end_seats, unseated_idxs = seat_ranges
+
+    sizes = get_family_sizes( family_info ).tolist()
+    names = [ f.fname + " " + f.lname for f in family_info ]
+
+    def position( v ):
+        return None if np.isnan( v ) else float( v )
+
+    sections, row_nos = pew_ids[0].tolist(), pew_ids[1].tolist()
+    pew_list = [ { 'section': sections[i],
+                   'row': row_nos[i],
+                   'length': int( pew_sizes[i] ),
+                   'seatWidth': int( seat_widths[i] ),
+                   'x': position( pew_positions[i][0] ),
+                   'y': position( pew_positions[i][1] ),
+                   'households': [] } for i in range( len(pew_sizes) ) ]
+
+    for pew_idx, (block, seats) in ( reserved or {} ).items():
+        pew_list[pew_idx]['households'].append( { 'name': "Reserved Block " + str( block + 1 ), 'size': seats, 'offset': 0,
+                                                  'seats': [1, seats], 'reserved': True } )
+
+    for pew, idx, offset, first, end in zip( pews.tolist(), idxs.tolist(), offsets.tolist(), first_seats.tolist(), end_seats.tolist() ):
+        pew_list[pew]['households'].append( { 'name': names[idx], 'size': sizes[idx], 'offset': offset,
+                                              'seats': [first, end - 1] if end > first else [] } )
+
+    return { 'sections': list( dict.fromkeys( sections ) ),
+             'pews': pew_list,
+             'unseated': [ { 'name': names[idx], 'size': sizes[idx] } for idx in unseated_idxs.tolist() ] }
+
+
 def write_seat_assignments_csv( seat_assignments_file, formatted_rows ):
     """
     Writes out seat assignments to file.
@@ -1,18 +1,78 @@
+import io
 import os
 import tempfile
+import threading
+import time
 import traceback
 
 from flask import Flask, render_template
-from flask import request, send_file, jsonify
+from flask import request, jsonify, Response, g
 
 from http import HTTPStatus
+from werkzeug.exceptions import RequestEntityTooLarge
 
 from .lib.constants import OUTPUT_FILE
 from .backend_intf import main_driver
 from .error_handlers import InvalidUsage, InternalError
+from .lib.io import ErrorObj
+from .plan_cache import Plan, PlanCache, get_plan_id
+from .profiling import is_profiler, run_profiled, get_profile_path, get_profile_text
+
+# Admission control
+MAX_UPLOAD_MB = int( os.environ.get( 'MAX_UPLOAD_MB', 2 ) )
+MAX_CONCURRENT_SOLVES = int( os.environ.get( 'MAX_CONCURRENT_SOLVES', 2 ) ) # Per worker, out of its threads
+SOLVE_QUEUE_TIMEOUT = int( os.environ.get( 'SOLVE_QUEUE_TIMEOUT', 5 ) ) # Seconds to wait for a free slot
+
+solve_slots = threading.BoundedSemaphore( MAX_CONCURRENT_SOLVES )
+
+# Computed plans, so repeat uploads and seat map views don't solve again
+MAX_CACHED_PLANS = int( os.environ.get( 'MAX_CACHED_PLANS', 32 ) ) # Shared by the workers (see plan_cache.py)
+plans = PlanCache( MAX_CACHED_PLANS )
+
+# Startup reporting
+worker_started = time.time() # Reset in each worker after fork (see gunicorn.conf.py)
+first_request_done = False
+
+# Small synthetic upload, to warm up the whole request path before serving
+WARM_UP_PEWS = ("Section,Row,Capacity,Seat Width,X Offset,Row Spacing\n"
+                "A,1,10,18,0,36\nA,2,10,18,0,36\nB,1,8,20,240,36\nB,2,8,20,240,36\n")
+WARM_UP_FAMILIES = ("First Name,Last Name,Size,E-mail\n" +
+                    "".join( "Warm,Up,%d,warm.up@example.com\n" % (i % 4 + 1) for i in range( 12 ) ))
 
 # Run the app
 app = Flask(__name__, static_folder='../build', static_url_path='/')
+app.config['MAX_CONTENT_LENGTH'] = MAX_UPLOAD_MB * 1024 * 1024
+
+
+def warm_up():
+    """
+    Runs the synthetic upload and seat map request through the app, so every
+    import, lazy initialization and solver code path is done before the first
+    real request. Returns how long it took, in seconds.
+    """
+    global first_request_done
+    start = time.time()
+    first_request_done = True
+
+    with app.test_client() as client:
+        response = client.post( '/api/upload', content_type='multipart/form-data', data={
+            'maxCapacity': '100', 'reservedSeating': '2', 'reservedBlocks': '2@A:1',
+            'separationRadius': '6', 'seatWidth': '18',
+            'pewFile': (io.BytesIO( WARM_UP_PEWS.encode() ), 'warm_up_pews.csv'),
+            'familyFile': (io.BytesIO( WARM_UP_FAMILIES.encode() ), 'warm_up_families.csv'),
+        } )
+        if response.status_code == HTTPStatus.OK:
+            client.get( '/api/seatmap/' + response.headers['X-Plan-Id'] )
+
+            # Don't keep the warm-up's plan around
+            plans.delete( response.headers['X-Plan-Id'] )
+        else:
+            print( 'Warm-up upload failed with status', response.status_code )
+
+    # Don't count the warm-up as a real request
+    first_request_done = False
+
+    return time.time() - start
 
 # Error handlers
 @app.errorhandler(InvalidUsage)
@@ -22,12 +82,35 @@ def handle_invalid_usage(error):
     return response
 
 
+@app.errorhandler(RequestEntityTooLarge)
+def handle_request_too_large(error):
+    err_obj = ErrorObj( "The uploaded files are larger than " + str( MAX_UPLOAD_MB ) + " MB. "\
+                        "Please split them into smaller files and try submitting again.",
+                        "Upload", -1, -1, "" )
+    return handle_invalid_usage( InvalidUsage( err_obj.to_dict(), HTTPStatus.REQUEST_ENTITY_TOO_LARGE ) )
+
+
 @app.errorhandler(InternalError)
 def handle_internal_error(error):
     response = jsonify(error.to_dict())
     response.status_code = error.status_code
     return response
 
+@app.before_request
+def time_first_request():
+    if not first_request_done:
+        g.request_started = time.time()
+
+
+@app.after_request
+def log_first_request(response):
+    global first_request_done
+    if not first_request_done and 'request_started' in g:
+        first_request_done = True
+        print( 'First request (%s %s) took %.3fs, %.1fs after the worker started' %
+               (request.method, request.path, time.time() - g.request_started, time.time() - worker_started) )
+    return response
+
 # Views
 @app.route("/")
 def home_view():
@@ -41,6 +124,7 @@ def test():
 
 @app.route("/api/upload", methods = ["POST"])
 def upload():
+    inputs = {}
     try:
         # Extract request parameters and put into dict for backend
         site_info = {}
@@ -50,6 +134,7 @@ def upload():
         site_info['numReservedSeating'] = int( request.form['reservedSeating'] )
         site_info['sepRad'] = int( request.form['separationRadius'] )
         site_info['seatWidth'] = int( request.form['seatWidth'] )
+        site_info['reservedBlocks'] = request.form.get( 'reservedBlocks', '' )
         site_info['pewFile'] = request.files['pewFile']
         site_info['familyFile'] = request.files['familyFile']
 
@@ -58,6 +143,20 @@ def upload():
         inputs['pewFile'] = inputs['pewFile'].filename
         inputs['familyFile'] = inputs['familyFile'].filename
 
+        # Same inputs, same plan
+        params = { k: v for k, v in site_info.items() if k not in ('pewFile', 'familyFile') }
+        files = [ request.files[k].read() for k in ('pewFile', 'familyFile') ]
+        for k in ('pewFile', 'familyFile'):
+            request.files[k].stream.seek(0)
+        plan_id = get_plan_id( params, files )
+
+        # Profiled requests always solve, since that's what is being profiled
+        profiled = is_profiler( request.headers )
+
+        csv_text = plans.get_csv( plan_id )
+        if csv_text is not None and not profiled:
+            return plan_csv_response( plan_id, csv_text )
+
         # Call backend
         with tempfile.NamedTemporaryFile(mode='w+') as temp_output_file, \
                 tempfile.NamedTemporaryFile(mode='w+') as pew_file, \
@@ -66,12 +165,30 @@ def upload():
             request.files['familyFile'].save( family_file.name )
             site_info['pewFile'] = (pew_file, request.files['pewFile'].filename)
             site_info['familyFile'] = (family_file, request.files['familyFile'].filename)
-            main_driver( site_info, temp_output_file )
 
-            # Stream file object back
+            # Only a few solves at a time per worker, so one big request can't
+            # starve everyone else of CPU and memory
+            if not solve_slots.acquire( timeout=SOLVE_QUEUE_TIMEOUT ):
+                err_obj = ErrorObj( "The server is busy seating other requests. Please try submitting again in a minute.",
+                                    "Upload", -1, -1, "" )
+                raise InvalidUsage( err_obj.to_dict(), HTTPStatus.TOO_MANY_REQUESTS )
+            try:
+                if profiled:
+                    seat_map = run_profiled( plan_id, main_driver, site_info, temp_output_file )
+                else:
+                    seat_map = main_driver( site_info, temp_output_file )
+            finally:
+                solve_slots.release()
+
             temp_output_file.seek(0)
-            return send_file( temp_output_file.name, as_attachment=True )
-    except InvalidUsage:
+            plan = Plan( plan_id, temp_output_file.read(), seat_map )
+            plans.put( plan )
+
+            response = plan_csv_response( plan.plan_id, plan.csv )
+            if profiled:
+                response.headers['X-Profile-Id'] = plan_id
+            return response
+    except (InvalidUsage, RequestEntityTooLarge):
         raise # Let InvalidUsage propagate up the stack.
     except:
         message = ("A fatal server error has occurred. Please relay the entirety"
@@ -81,3 +198,48 @@ def upload():
             'inputs': inputs,
         }
         raise InternalError(message, error)
+
+
+@app.route("/api/seatmap/<plan_id>", methods = ["GET"])
+def seat_map(plan_id):
+    # The plan never changes for an ID, so a matching ETag means the client is up to date
+    etag = plans.get_etag( plan_id )
+    if etag is not None and request.if_none_match.contains_weak( etag ):
+        response = Response( status=HTTPStatus.NOT_MODIFIED )
+    else:
+        body = plans.get_seat_map( plan_id ) if etag is not None else None
+        if body is None:
+            err_obj = ErrorObj( "This seating plan has expired. Please submit the files again.", "Seat map", -1, -1, "" )
+            raise InvalidUsage( err_obj.to_dict(), HTTPStatus.NOT_FOUND )
+        response = Response( body, mimetype='application/json' )
+    response.set_etag( etag )
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+@app.route("/api/profile/<profile_id>", methods = ["GET"])
+def profile(profile_id):
+    path = get_profile_path( profile_id )
+    if not is_profiler( request.headers ) or path is None or not os.path.exists( path ):
+        err_obj = ErrorObj( "There is no profile with this ID.", "Profile", -1, -1, "" )
+        raise InvalidUsage( err_obj.to_dict(), HTTPStatus.NOT_FOUND )
+
+    # Text summary for reading in the browser, or the raw stats for pstats/snakeviz
+    if request.args.get( 'format' ) == 'text':
+        return Response( get_profile_text( path ), mimetype='text/plain' )
+    with open( path, 'rb' ) as f:
+        response = Response( f.read(), mimetype='application/octet-stream' )
+    response.headers['Content-Disposition'] = 'attachment; filename=' + profile_id + '.prof'
+    return response
+
+
+def plan_csv_response(plan_id, csv_text):
+    """
+    Returns the plan's seat assignments as a CSV download, with the plan ID
+    in a header for fetching the seat map.
+    """
+    response = Response( csv_text, mimetype='text/csv' )
+    response.headers['Content-Disposition'] = 'attachment; filename=seating_arrangements.csv'
+    response.headers['X-Plan-Id'] = plan_id
+    return response
+
@@ -0,0 +1,133 @@
+"""
+Cache of computed seating plans, keyed by a hash of the inputs.
+
+Plans are saved as files under PLAN_DIR, so every worker process on the machine
+sees the same plans, whichever one solved them.
+"""
+import hashlib
+import json
+import os
+import re
+import tempfile
+
+PLAN_DIR = os.environ.get( 'PLAN_DIR', os.path.join( tempfile.gettempdir(), 'seating-plans' ) )
+PLAN_ID_REGEX = re.compile( '^[0-9a-f]{32}$' )
+
+
+class Plan():
+
+    def __init__(self, plan_id, csv_text, seat_map):
+        self.plan_id = plan_id
+        self.csv = csv_text
+
+        # Serialize once up front, so serving the seat map is just a lookup
+        self.seat_map = json.dumps( seat_map, separators=(',', ':') ).encode()
+        self.etag = hashlib.sha256( self.seat_map ).hexdigest()[:32]
+
+
+class PlanCache():
+    """
+    Least recently used cache of the last max_plans plans, saved in plan_dir.
+    Each plan is three files named by its ID: the CSV download, the seat map
+    JSON and the seat map's ETag, so a 304 only has to read the ETag.
+    """
+
+    def __init__(self, max_plans, plan_dir=PLAN_DIR):
+        self.max_plans = max_plans
+        self.plan_dir = plan_dir
+
+    def _path(self, plan_id, ext):
+        if not PLAN_ID_REGEX.match( plan_id ):
+            return None
+        return os.path.join( self.plan_dir, plan_id + ext )
+
+    def _read(self, plan_id, ext, mode='r'):
+        path = self._path( plan_id, ext )
+        if path is None:
+            return None
+        try:
+            with open( path, mode ) as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def get_csv(self, plan_id):
+        """
+        Returns the plan's CSV text, or None if there is no such plan.
+        """
+        csv_text = self._read( plan_id, '.csv' )
+        if csv_text is not None:
+            self._touch( plan_id )
+        return csv_text
+
+    def get_etag(self, plan_id):
+        """
+        Returns the ETag of the plan's seat map, or None if there is no such plan.
+        """
+        return self._read( plan_id, '.etag' )
+
+    def get_seat_map(self, plan_id):
+        """
+        Returns the plan's serialized seat map, or None if there is no such plan.
+        """
+        seat_map = self._read( plan_id, '.json', 'rb' )
+        if seat_map is not None:
+            self._touch( plan_id )
+        return seat_map
+
+    def _touch(self, plan_id):
+        # The ETag file's modification time is when the plan was last used
+        try:
+            os.utime( self._path( plan_id, '.etag' ) )
+        except FileNotFoundError:
+            pass
+
+    def delete(self, plan_id):
+        for ext in ('.etag', '.json', '.csv'):
+            path = self._path( plan_id, ext )
+            if path is None:
+                return
+            try:
+                os.remove( path )
+            except FileNotFoundError:
+                pass
+
+    def put(self, plan):
+        os.makedirs( self.plan_dir, exist_ok=True )
+
+        # Write each file under a temporary name and rename it into place, so
+        # other workers never read a half written plan. The ETag goes last,
+        # since it's what marks the plan as saved.
+        for ext, contents in (('.csv', plan.csv.encode()), ('.json', plan.seat_map), ('.etag', plan.etag.encode())):
+            with tempfile.NamedTemporaryFile( dir=self.plan_dir, suffix='.tmp', delete=False ) as f:
+                f.write( contents )
+            os.replace( f.name, self._path( plan.plan_id, ext ) )
+
+        self._evict()
+
+    def _evict(self):
+        # Plans that another worker is evicting at the same time may be gone already
+        etags = []
+        for name in os.listdir( self.plan_dir ):
+            if name.endswith( '.etag' ):
+                try:
+                    etags.append( (os.path.getmtime( os.path.join( self.plan_dir, name ) ), name[:-len( '.etag' )]) )
+                except FileNotFoundError:
+                    pass
+
+        etags.sort( reverse=True )
+        for _, plan_id in etags[self.max_plans:]:
+            self.delete( plan_id )
+
+
+def get_plan_id( params, files ):
+    """
+    Returns the plan ID for a set of form parameters and uploaded file contents.
+    The same inputs always give the same plan, so they get the same ID.
+    """
+    h = hashlib.sha256()
+    for key in sorted( params ):
+        h.update( (key + "=" + str( params[key] ) + "\n").encode() )
+    for contents in files:
+        h.update( hashlib.sha256( contents ).digest() )
+    return h.hexdigest()[:32]
@@ -0,0 +1,84 @@
+"""
+Opt-in profiling of single uploads, for finding out why one input is slow.
+
+Profiling is off unless the PROFILE_TOKEN environment variable is set, and a
+request only gets profiled when it sends that token in the X-Profile-Token
+header. Other requests don't pay anything for it.
+"""
+import cProfile
+import hmac
+import io
+import os
+import pstats
+import re
+import tempfile
+
+PROFILE_TOKEN = os.environ.get( 'PROFILE_TOKEN', '' )
+PROFILE_DIR = os.environ.get( 'PROFILE_DIR', os.path.join( tempfile.gettempdir(), 'seating-profiles' ) )
+PROFILE_ID_REGEX = re.compile( '^[0-9a-f]{32}$' )
+MAX_PROFILES = int( os.environ.get( 'MAX_PROFILES', 32 ) )
+
+
+def is_profiler( headers ):
+    """
+    Returns whether the request headers carry the admin profiling token.
+    """
+    token = headers.get( 'X-Profile-Token', '' )
+    return bool( PROFILE_TOKEN ) and hmac.compare_digest( token.encode(), PROFILE_TOKEN.encode() )
+
+
+def run_profiled( profile_id, func, *args ):
+    """
+    Calls func(*args) under cProfile and saves the profile as profile_id, which
+    should be the plan ID (a hash of the inputs). Only the MAX_PROFILES most
+    recent profiles are kept. Returns what func returns.
+    """
+    profile = cProfile.Profile()
+    try:
+        return profile.runcall( func, *args )
+    finally:
+        os.makedirs( PROFILE_DIR, exist_ok=True )
+        profile.dump_stats( get_profile_path( profile_id ) )
+        evict_profiles()
+
+
+def evict_profiles( max_profiles=None ):
+    """
+    Deletes all but the max_profiles (default MAX_PROFILES) most recent profiles.
+    """
+    if max_profiles is None:
+        max_profiles = MAX_PROFILES
+
+    # Profiles that another worker is evicting at the same time may be gone already
+    profiles = []
+    for name in os.listdir( PROFILE_DIR ):
+        if name.endswith( '.prof' ):
+            try:
+                profiles.append( (os.path.getmtime( os.path.join( PROFILE_DIR, name ) ), name) )
+            except FileNotFoundError:
+                pass
+
+    profiles.sort( reverse=True )
+    for _, name in profiles[max_profiles:]:
+        try:
+            os.remove( os.path.join( PROFILE_DIR, name ) )
+        except FileNotFoundError:
+            pass
+
+
+def get_profile_path( profile_id ):
+    """
+    Returns where the profile is saved, or None if the ID isn't a valid plan ID.
+    """
+    if not PROFILE_ID_REGEX.match( profile_id ):
+        return None
+    return os.path.join( PROFILE_DIR, profile_id + '.prof' )
+
+
+def get_profile_text( path, limit=50 ):
+    """
+    Returns a readable summary of a saved profile, sorted by cumulative time.
+    """
+    out = io.StringIO()
+    pstats.Stats( path, stream=out ).sort_stats( 'cumulative' ).print_stats( limit )
+    return out.getvalue()
@@ -0,0 +1,55 @@
+import io
+
+import pytest
+
+from . import main
+from .plan_cache import PlanCache
+
+def upload(client, pews):
+    return client.post('/api/upload', content_type='multipart/form-data', data={
+        'maxCapacity': '100', 'reservedSeating': '0', 'separationRadius': '6', 'seatWidth': '18',
+        'pewFile': (io.BytesIO(pews.encode()), 'pews.csv'),
+        'familyFile': (io.BytesIO(b"First,Last,Size,E-mail\nA,B,2,a@example.com\n"), 'families.csv'),
+    })
+
+@pytest.fixture(autouse=True)
+def plans(monkeypatch, tmp_path):
+    monkeypatch.setattr(main, 'plans', PlanCache(32, str(tmp_path)))
+    return tmp_path
+
+def test_seat_map_other_worker(monkeypatch, plans):
+    response = upload(main.app.test_client(), "Section,Row,Capacity\nA,1,10\n")
+    plan_id = response.headers['X-Plan-Id']
+
+    # Another worker has its own cache object, but finds the plan on disk
+    monkeypatch.setattr(main, 'plans', PlanCache(32, str(plans)))
+    client = main.app.test_client()
+
+    response = client.get('/api/seatmap/' + plan_id)
+    assert response.status_code == 200
+    assert response.get_json()['pews'][0]['households'][0]['name'] == 'A B'
+
+    response = client.get('/api/seatmap/' + plan_id, headers={'If-None-Match': response.headers['ETag']})
+    assert response.status_code == 304
+
+    assert client.get('/api/seatmap/' + '0' * 32).status_code == 404
+    assert client.get('/api/seatmap/..%2Fplan').status_code == 404
+
+def test_upload_busy(monkeypatch):
+    monkeypatch.setattr(main, 'SOLVE_QUEUE_TIMEOUT', 0)
+
+    # Every solve slot is taken, so the upload gives up instead of waiting
+    for _ in range(main.MAX_CONCURRENT_SOLVES):
+        main.solve_slots.acquire()
+    try:
+        response = upload(main.app.test_client(), "Section,Row,Capacity\nA,1,11\n")
+    finally:
+        for _ in range(main.MAX_CONCURRENT_SOLVES):
+            main.solve_slots.release()
+
+    assert response.status_code == 429
+    assert response.get_json()['errors'][0]['file'] == 'Upload'
+
+    # Once a slot is free, the same upload goes through
+    response = upload(main.app.test_client(), "Section,Row,Capacity\nA,1,11\n")
+    assert response.status_code == 200
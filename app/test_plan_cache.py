@@ -0,0 +1,17 @@
+import os
+
+from .plan_cache import Plan, PlanCache
+
+def test_plan_cache_evicts_least_recent(tmp_path):
+    plans = PlanCache(2, str(tmp_path))
+    for i, plan_id in enumerate(['a' * 32, 'b' * 32, 'c' * 32]):
+        plans.put(Plan(plan_id, 'csv', {}))
+        os.utime(tmp_path / (plan_id + '.etag'), (i, i))
+        if i == 1:
+            # Using the first plan makes the second one the oldest
+            plans.get_csv('a' * 32)
+
+    assert plans.get_etag('b' * 32) is None
+    assert plans.get_csv('a' * 32) == 'csv'
+    assert plans.get_seat_map('c' * 32) == b'{}'
+    assert sorted(os.listdir(tmp_path)) == sorted(p + ext for p in ['a' * 32, 'c' * 32] for ext in ('.csv', '.json', '.etag'))
@@ -0,0 +1,14 @@
+import os
+
+from . import profiling
+
+def test_run_profiled_evicts_oldest(monkeypatch, tmp_path):
+    monkeypatch.setattr(profiling, 'PROFILE_DIR', str(tmp_path))
+    monkeypatch.setattr(profiling, 'MAX_PROFILES', 2)
+
+    for i, profile_id in enumerate(['a' * 32, 'b' * 32, 'c' * 32]):
+        assert profiling.run_profiled(profile_id, sum, [i, 1]) == i + 1
+        os.utime(profiling.get_profile_path(profile_id), (i, i))
+
+    # Saving the third profile deletes the oldest one
+    assert sorted(os.listdir(tmp_path)) == ['b' * 32 + '.prof', 'c' * 32 + '.prof']
@@ -0,0 +1,32 @@
+from .lib.io.Family import FamilyInfo
+from .utils import admit_families
+
+def families(*sizes):
+    return [FamilyInfo("F" + str(i), "L", size, "f@example.com") for i, size in enumerate(sizes)]
+
+def names(family_info_list):
+    return [f.fname for f in family_info_list]
+
+def test_admit_families_max_cap():
+    seatable, unseatable = admit_families(families(3, 2, 4, 1), 5, [100], 4)
+
+    # The family of 4 would go over, and everyone after them waits their turn
+    assert names(seatable) == ["F0", "F1"]
+    assert names(unseatable) == ["F2", "F3"]
+
+def test_admit_families_pew_space():
+    # Two pews of 6 with a margin of 4 have 2 * (6 + 4) = 20 seats of room. Each
+    # family of 2 takes 2 + 4, so the family of 1 (1 + 4) would be one too many.
+    seatable, unseatable = admit_families(families(2, 2, 2, 1), 100, [6, 6], 4)
+
+    assert names(seatable) == ["F0", "F1", "F2"]
+    assert names(unseatable) == ["F3"]
+
+def test_admit_families_too_big():
+    # Nobody fits a family of 8 in 18" seats, but that doesn't hold up the rest
+    seatable, unseatable = admit_families(families(8, 2, 3), 100, [6 * 18, 7 * 18], 72, [18, 18])
+
+    assert names(seatable) == ["F1", "F2"]
+    assert names(unseatable) == ["F0"]
+
+    assert admit_families([], 100, [6], 4) == ([], [])
@@ -1,27 +1,56 @@
 """
 Driver helper functions.
 """
+import numpy as np
+
 from .lib.io.Family import get_family_sizes
+from .lib.algo.pews import seat_margin
 
 
-def trim_families( family_info_list, max_cap ):
+def admit_families( family_info_list, max_cap, pew_sizes, margin, seat_widths=None ):
     """
     Separates the list of families into seatable and non-seatable, and returns
-    both as a tuple (seatable, non-seatable).
+    both as a tuple (seatable, non-seatable), each in registration order.
+
+    Families are admitted first come, first served, until the next one would
+    go past max_cap people or past what the pews could possibly hold. Families
+    too big for every pew are never admitted, but don't stop the families
+    after them. Pew sizes and the margin are in the same unit as seat_widths,
+    and the margin is rounded up to whole seats like get_pews does.
     """
-    curr_family_size = 0
+    family_sizes = get_family_sizes( family_info_list )
+    if len( family_sizes ) == 0:
+        return [], []
 
-    # If curr_family_size never reaches max_cap, then we can seat all families
-    last_family_seated_idx = len( family_info_list ) - 1
+    pew_sizes = np.asarray( pew_sizes )
+    if seat_widths is None:
+        seat_widths = np.ones( len(pew_sizes), dtype=int )
+    seat_widths = np.asarray( seat_widths )
+    margins = seat_margin( margin, seat_widths )
 
-    # Stop at the one just before it goes past capacity
-    family_sizes = get_family_sizes( family_info_list )
-    for i, size in enumerate( family_sizes ):
-        if curr_family_size <= max_cap:
-            curr_family_size += size
-        else:
-            last_family_seated_idx = i - 1
-            break
+    # Smallest footprint (size plus margin) each family size takes in any pew
+    # it fits in, from the histogram of sizes rather than every family
+    sizes, size_idxs = np.unique( family_sizes, return_inverse=True )
+    widths = sizes[:, None] * seat_widths[None, :]
+    footprints = np.where( widths <= pew_sizes[None, :], widths + margins[None, :], np.inf ).min( axis=1 )[size_idxs]
+    possible = np.isfinite( footprints )
+
+    # The pews can't hold more than their space plus the margin saved at the end,
+    # or more families than one-person families fit in them
+    usable = pew_sizes >= seat_widths
+    total_space = ( pew_sizes[usable] + margins[usable] ).sum()
+    max_families = ( ( pew_sizes[usable] + margins[usable] ) // ( seat_widths[usable] + margins[usable] ) ).sum()
+
+    people = np.cumsum( np.where( possible, family_sizes, 0 ) )
+    space = np.cumsum( np.where( possible, footprints, 0 ) )
+    count = np.cumsum( possible )
+    fits = ( people <= max_cap ) & ( space <= total_space ) & ( count <= max_families )
 
-    return family_info_list[:last_family_seated_idx + 1], family_info_list[last_family_seated_idx + 1:]
+    # Totals only grow, so everyone after the first family that doesn't fit is out too
+    over = np.flatnonzero( possible & ~fits )
+    cut = over[0] if len( over ) > 0 else len( family_sizes )
+    admitted = possible & ( np.arange( len( family_sizes ) ) < cut )
 
+    seatable = [ f for f, a in zip( family_info_list, admitted ) if a ]
+    unseatable = [ f for f, a in zip( family_info_list, admitted ) if not a ]
+    return seatable, unseatable
@@ -0,0 +1,39 @@
+"""
+Gunicorn settings for production.
+
+The app is loaded and warmed up once in the master process, before any workers
+are forked. Workers start with everything imported and initialized, sharing
+the master's memory copy-on-write instead of each building their own.
+
+Each worker serves several requests at once on threads, and the app limits how
+many of them solve at the same time (MAX_CONCURRENT_SOLVES in app/main.py).
+"""
+import gc
+import os
+import time
+
+preload_app = True
+
+worker_class = 'gthread'
+threads = int( os.environ.get( 'GUNICORN_THREADS', 4 ) )
+
+master_started = time.time()
+
+
+def when_ready(server):
+    from app.main import warm_up
+
+    warm_up_secs = warm_up()
+
+    # Move everything built so far out of the garbage collector's reach, so
+    # collections in the workers don't touch (and copy) the shared pages
+    gc.collect()
+    gc.freeze()
+
+    server.log.info( "Startup took %.2fs (warm-up %.2fs)", time.time() - master_started, warm_up_secs )
+
+
+def post_fork(server, worker):
+    from app import main
+
+    main.worker_started = time.time()
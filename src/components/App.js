@@ -101,8 +101,8 @@ function App() {
         const error = await response.json();
         setFatalError(error);
         resetFiles(true);
-      } else if (response.status === 400) {
-        // Bad inputs.
+      } else if ([400, 413, 429].includes(response.status)) {
+        // Bad inputs, or too much to seat right now.
         const error = await response.json();
         setInputError(error);
         resetFiles(true);
@@ -5,6 +5,7 @@ import Button from 'react-bootstrap/Button';
 import { Field } from 'formik';
 
 import NumberInput from './NumberInput';
+import TextInput from './TextInput';
 import FileInput from './FileInput';
 
 const InputForm = (formik) => {
@@ -31,7 +32,16 @@ const InputForm = (formik) => {
           label="Number of Reserved Seating"
           placeholder="e.g. 10"
           isInvalid={touched.reservedSeating && !!errors.reservedSeating}
-          explanation="This number represents the number of people to not include in the seating chart, but need space in the church to sit. Do not include the pews you are reserving for them in the pew info CSV file. This number is only used in calculating how many families can potentially be seated."
+          explanation="This number represents the number of people to not include in the seating chart, but need space in the church to sit. It is taken out of the maximum capacity before seating families, along with any reserved blocks below (whichever is larger). Reserved blocks are seated in pews from the pew info CSV file, so keep those pews in the file."
+        />
+      </Form.Group>
+      <Form.Group>
+        <TextInput
+          name="reservedBlocks"
+          label="Reserved Blocks (optional)"
+          placeholder="e.g. 6@A:1, 4@B, 2"
+          isInvalid={touched.reservedBlocks && !!errors.reservedBlocks}
+          explanation="Reserved seats to set aside in the pews from the pew info CSV file before seating households, separated by commas. Each block is a number of seats, optionally followed by @ and a section, and : and a row (e.g. 6@A:1 is 6 seats in section A, row 1). If a block doesn't fit in its section or row, it is placed in any free pews instead. These people should also be counted in the number of reserved seating above."
         />
       </Form.Group>
       <Form.Group>
@@ -7,9 +7,13 @@ const isCsvType = (value) => {
   return value && (value.type === 'text/csv' || value.name.endsWith( '.csv' ))
 }
 
+const reservedBlock = String.raw`\s*\d+(@[^,@:]+(:[^,@:]+)?)?\s*`;
+const reservedBlocksRegex = new RegExp(`^${reservedBlock}(,${reservedBlock})*$`);
+
 export const validationSchema = yup.object({
   maxCapacity: yup.number().min(1, 'Must have at least one spot of capacity.').required('A maximum capacity is required.'),
   reservedSeating: yup.number().min(0, 'Cannot have a negative number of seats.').max(yup.ref('maxCapacity'), 'Reserved seating cannot exceed maximum capacity.').required('Reserved seating is required.'),
+  reservedBlocks: yup.string().matches(reservedBlocksRegex, { message: 'Each block must be a number of seats, optionally followed by @section or @section:row.', excludeEmptyString: true }),
   separationRadius: yup.number().required('A separation radius is required.'),
   seatWidth: yup.number().min(1, 'Seats must have a positive non-zero width.').required('A seat width is required.'),
   pewFile: yup.mixed().required('A pew file is required.').test('fileFormat', 'Must be a CSV file.', isCsvType),
@@ -19,6 +23,7 @@ export const validationSchema = yup.object({
 export const initialValues = {
   maxCapacity: '',
   reservedSeating: '',
+  reservedBlocks: '',
   separationRadius: '',
   seatWidth: '',
   pewFile: null,